@@ -1,8 +1,11 @@
+import argparse
 import yfinance as yf
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
 
+# matplotlib importujemy dopiero przy rysowaniu, a styl wykresu wczytujemy tylko raz
+styl_zaladowany = False
+
 def pobierz_dane(ticker: str, start: str, end: str) -> pd.DataFrame:
     """
     Pobiera historyczne dane giełdowe dla danego tickera z Yahoo Finance.
@@ -27,14 +30,18 @@ def pobierz_dane(ticker: str, start: str, end: str) -> pd.DataFrame:
         print(f"Wystąpił błąd podczas pobierania danych: {e}")
         return None
 
-def analizuj_i_rysuj_wykres(dane: pd.DataFrame, ticker: str):
+def analizuj_i_rysuj_wykres(dane: pd.DataFrame, ticker: str, pokaz: bool = True):
     """
     Oblicza średnie kroczące i rysuje wykres ceny zamknięcia.
 
     Args:
         dane (pd.DataFrame): Ramka danych z danymi historycznymi.
         ticker (str): Symbol giełdowy spółki.
+        pokaz (bool): Jeśli False, wykres jest zapisywany do pliku PNG zamiast wyświetlania
+                      (backend Agg, bez inicjalizacji interfejsu graficznego).
     """
+    global styl_zaladowany
+
     if dane is None or dane.empty:
         print("Brak danych do analizy.")
         return
@@ -44,7 +51,15 @@ def analizuj_i_rysuj_wykres(dane: pd.DataFrame, ticker: str):
     dane['SMA200'] = dane['Close'].rolling(window=200).mean()
 
     # Rysowanie wykresu
-    plt.style.use('seaborn-v0_8-darkgrid')
+    import matplotlib
+    if not pokaz:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    if not styl_zaladowany:
+        plt.style.use('seaborn-v0_8-darkgrid')
+        styl_zaladowany = True
+
     plt.figure(figsize=(14, 7))
     plt.plot(dane['Close'], label='Cena zamknięcia (Close)', color='blue', alpha=0.7)
     plt.plot(dane['SMA50'], label='Średnia krocząca 50-dniowa (SMA50)', color='orange', linestyle='--')
@@ -54,13 +69,25 @@ def analizuj_i_rysuj_wykres(dane: pd.DataFrame, ticker: str):
     plt.xlabel('Data')
     plt.ylabel('Cena (USD)')
     plt.legend()
-    plt.show()
+
+    if pokaz:
+        plt.show()
+    else:
+        nazwa_pliku = f'wykres_{ticker}.png'
+        plt.savefig(nazwa_pliku)
+        plt.close()
+        print(f"Wykres zapisano do pliku: {nazwa_pliku}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analiza ceny akcji ze średnimi kroczącymi.")
+    parser.add_argument('--no-show', action='store_true',
+                        help="Zapisz wykres do pliku PNG zamiast go wyświetlać (tryb bez GUI).")
+    args = parser.parse_args()
+
     # --- Konfiguracja ---
     ticker_spolki = 'AAPL'  # Zmień na symbol innej spółki, np. 'MSFT', 'GOOGL', 'TSLA'
     data_poczatkowa = '2020-01-01'
     data_koncowa = datetime.now().strftime('%Y-%m-%d') # Dzisiejsza data
 
     dane_gieldowe = pobierz_dane(ticker_spolki, data_poczatkowa, data_koncowa)
-    analizuj_i_rysuj_wykres(dane_gieldowe, ticker_spolki)
\ No newline at end of file
+    analizuj_i_rysuj_wykres(dane_gieldowe, ticker_spolki, pokaz=not args.no_show)
\ No newline at end of file
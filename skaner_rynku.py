@@ -1,21 +1,97 @@
+import argparse
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Final
+
+import numpy as np
 import pandas as pd
 import yfinance as yf
+from yfinance import multi as yf_multi
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba jest opcjonalna - bez niej jądra obliczeniowe wykonują się jako zwykły Python
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda funkcja: funkcja
+
+# Lokalny cache, dzięki któremu kolejne uruchomienia nie pobierają ponownie tych samych danych z sieci
+KATALOG_CACHE = Path('~/.cache/vibe_stocks').expanduser()
+PLIK_CACHE_NASDAQ = KATALOG_CACHE / 'nasdaq.csv'
+PLIK_CACHE_KAPITALIZACJI = KATALOG_CACHE / 'marketcap.sqlite'
+TTL_NASDAQ = 24 * 60 * 60          # lista spółek zmienia się rzadko - odświeżamy raz na dobę
+TTL_KAPITALIZACJI = 6 * 60 * 60    # kapitalizacja między uruchomieniami zmienia się nieznacznie
+
+# Definicja okresów w dniach handlowych (przybliżenie). Stałe przekazujemy do jądra obliczeniowego
+# jako argumenty, więc przesunięcia indeksów są znane w jednym miejscu dla całego modułu.
+DNI_KWARTAL: Final[int] = 63
+DNI_POLROCZE: Final[int] = 126
+DNI_WZROST_KROTKI: Final[int] = 3   # okres porównania z S&P 500
+DNI_BEZ_SPADKU: Final[int] = 6      # okres, w którym kurs nie może spaść
+
+# Liczba równoległych zapytań o kapitalizację - wystarczająco dużo, by ukryć opóźnienia sieci,
+# i na tyle mało, by nie przekraczać limitów zapytań Yahoo
+MAX_WATKOW_INFO = 20
+
+# Liczba tickerów pobieranych jednym wywołaniem yf.download - mniejsze ramki to niższe zużycie pamięci
+ROZMIAR_PACZKI = 500
+
+# Do wersji 1.3.x yf.download zapisuje wyniki we współdzielonym słowniku modułu (shared._DFS), więc
+# równoległe wywołania nadpisywałyby sobie dane. Od wersji 1.4 każde wywołanie ma własny kontekst
+# (_DownloadCtx) i paczki można pobierać równolegle - sprawdzamy obecność tej klasy zamiast numeru wersji.
+DOWNLOAD_WIELOWATKOWY = hasattr(yf_multi, '_DownloadCtx')
+MAX_WATKOW_DOWNLOAD = 4
+
+# Wspólna sesja HTTP dla wszystkich zapytań do Yahoo - połączenia (TCP/TLS) są utrzymywane i ponownie
+# używane przez wszystkie wątki zamiast nawiązywania nowego połączenia dla każdej spółki.
+# Nowsze wersje yfinance akceptują wyłącznie sesje curl_cffi, starsze - zwykłe requests.Session.
+try:
+    from curl_cffi import requests as curl_requests
+    SESJA_HTTP = curl_requests.Session(impersonate="chrome")
+except ImportError:
+    import requests
+    from requests.adapters import HTTPAdapter
+    SESJA_HTTP = requests.Session()
+    SESJA_HTTP.mount('https://', HTTPAdapter(pool_connections=MAX_WATKOW_INFO, pool_maxsize=50))
 
 def pobierz_liste_spolek_nasdaq() -> list:
     """
-    Pobiera listę tickerów z serwera FTP NASDAQ i filtruje ją.
+    Pobiera listę tickerów z serwera NASDAQ i filtruje ją.
+    Wynik jest zapisywany w lokalnym cache i ponownie używany przez TTL_NASDAQ sekund.
 
     Returns:
         list: Lista tickerów spółek (bez ETFów i instrumentów testowych).
     """
-    # Adres URL do pliku z listą wszystkich symboli na NASDAQ
-    url = "ftp://ftp.nasdaqtrader.com/symboldirectory/nasdaqtraded.txt"
+    # Jeśli lista w cache jest świeża, nie musimy jej ponownie pobierać
+    if PLIK_CACHE_NASDAQ.exists() and time.time() - PLIK_CACHE_NASDAQ.stat().st_mtime < TTL_NASDAQ:
+        try:
+            # Jedna kolumna symboli jako CSV - bez zależności od silnika parquet (pyarrow/fastparquet).
+            # keep_default_na=False, tak jak przy pobieraniu, żeby ticker 'NA' nie stał się brakiem danych
+            tickers = pd.read_csv(PLIK_CACHE_NASDAQ, dtype=str, keep_default_na=False)['Symbol'].tolist()
+            print(f"Wczytano listę spółek z cache. Znaleziono {len(tickers)} spółek.")
+            return tickers
+        except Exception as e:
+            print(f"Nie udało się wczytać listy spółek z cache, pobieram ponownie. Błąd: {e}")
+
+    # Adres URL do pliku z listą wszystkich symboli na NASDAQ (mirror HTTPS jest szybszy i pewniejszy niż FTP)
+    url = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt"
     
     print("Pobieranie listy spółek z serwera NASDAQ...")
     try:
         # Używamy pandas do wczytania danych, separatorem jest '|'
-        # Ostatnia linijka pliku to stopka, którą pomijamy (skipfooter=1)
-        df = pd.read_csv(url, sep='|', skipfooter=1, engine='python')
+        # Szybki parser C nie obsługuje skipfooter, więc ostatnią linijkę (stopkę) odcinamy ręcznie
+        # Kolumny flag wczytujemy jako kategorie - filtrowanie porównuje wtedy kody zamiast napisów
+        # keep_default_na=False: ticker 'NA' (Nano Labs) to prawdziwy symbol, a nie brak danych
+        df = pd.read_csv(url, sep='|', engine='c', keep_default_na=False,
+                         dtype={'Symbol': 'string', 'Test Issue': 'category', 'ETF': 'category'})
+        df = df.iloc[:-1]
         
         # Filtrujemy dane, aby zostawić tylko akcje zwykłe
         # Usuwamy ETFy ('N' w kolumnie ETF)
@@ -25,24 +101,259 @@ def pobierz_liste_spolek_nasdaq() -> list:
         # Zwracamy listę symboli (tickerów)
         tickers = spolki['Symbol'].tolist()
         print(f"Pobrano i przefiltrowano listę. Znaleziono {len(tickers)} spółek.")
-        return tickers
 
     except Exception as e:
         print(f"Nie udało się pobrać listy spółek. Błąd: {e}")
         return []
 
-def znajdz_spolki_wzrostowe(tickers: list, limit_spolek: int = 4000):
+    try:
+        KATALOG_CACHE.mkdir(parents=True, exist_ok=True)
+        spolki[['Symbol']].to_csv(PLIK_CACHE_NASDAQ, index=False)
+    except Exception as e:
+        # Brak cache nie przeszkadza w analizie - przy następnym uruchomieniu lista zostanie pobrana ponownie
+        print(f"Nie udało się zapisać listy spółek do cache. Błąd: {e}")
+
+    return tickers
+
+def wczytaj_kapitalizacje_z_cache(tickers: list) -> dict:
+    """
+    Wczytuje z lokalnej bazy SQLite kapitalizacje pobrane w ciągu ostatnich TTL_KAPITALIZACJI sekund.
+
+    Args:
+        tickers (list): Lista tickerów, dla których szukamy kapitalizacji.
+
+    Returns:
+        dict: Słownik ticker -> kapitalizacja (tylko dla trafień w cache).
+    """
+    if not PLIK_CACHE_KAPITALIZACJI.exists():
+        return {}
+
+    try:
+        with closing(sqlite3.connect(PLIK_CACHE_KAPITALIZACJI)) as conn:
+            wiersze = conn.execute(
+                "SELECT ticker, cap FROM marketcap WHERE fetched_at >= ?",
+                (time.time() - TTL_KAPITALIZACJI,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Nie udało się odczytać cache kapitalizacji. Błąd: {e}")
+        return {}
+
+    szukane = set(tickers)
+    return {ticker: cap for ticker, cap in wiersze if ticker in szukane}
+
+def zapisz_kapitalizacje_do_cache(kapitalizacje: dict):
+    """
+    Zapisuje pobrane kapitalizacje do lokalnej bazy SQLite wraz z czasem pobrania.
+
+    Args:
+        kapitalizacje (dict): Słownik ticker -> kapitalizacja.
+    """
+    if not kapitalizacje:
+        return
+
+    teraz = time.time()
+    try:
+        KATALOG_CACHE.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(PLIK_CACHE_KAPITALIZACJI)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS marketcap "
+                "(ticker TEXT PRIMARY KEY, cap REAL NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO marketcap (ticker, cap, fetched_at) VALUES (?, ?, ?)",
+                [(ticker, cap, teraz) for ticker, cap in kapitalizacje.items()]
+            )
+    except (sqlite3.Error, OSError) as e:
+        print(f"Nie udało się zapisać cache kapitalizacji. Błąd: {e}")
+
+def pobierz_kapitalizacje(ticker: str) -> tuple:
+    """
+    Pobiera kapitalizację rynkową dla pojedynczej spółki (wywoływane z puli wątków).
+
+    Args:
+        ticker (str): Symbol giełdowy spółki.
+
+    Returns:
+        tuple: Para (ticker, kapitalizacja) - kapitalizacja to None w przypadku błędu.
+    """
+    try:
+        return ticker, yf.Ticker(ticker, session=SESJA_HTTP).info.get('marketCap')
+    except Exception:
+        # Ignorujemy błędy przy pobieraniu info dla pojedynczego tickera
+        return ticker, None
+
+def pobierz_paczke(paczka: list) -> pd.DataFrame:
+    """
+    Pobiera ceny zamknięcia z ostatnich 7 miesięcy dla jednej paczki tickerów.
+
+    Args:
+        paczka (list): Lista tickerów (najwyżej ROZMIAR_PACZKI).
+
+    Returns:
+        pd.DataFrame: Macierz cen zamknięcia (dni × tickery) lub pusta ramka, jeśli nic nie pobrano.
+    """
+    print(f"Pobieranie paczki {len(paczka)} spółek (od {paczka[0]})...")
+    # Pobieramy dane z ostatnich 7 miesięcy, aby mieć pewność, że pokryjemy 6 miesięcy handlowych.
+    # auto_adjust=True automatycznie dostosowuje ceny o dywidendy i splity, co jest lepsze do analizy zwrotów.
+    # actions=False pomija dywidendy i splity, których nie potrzebujemy (auto_adjust już je uwzględnia)
+    dane = yf.download(paczka, period="7mo", auto_adjust=True, actions=False, progress=False,
+                       group_by='ticker', threads=True, session=SESJA_HTTP)
+    # Pusta paczka (np. żaden ticker nie zwrócił danych) nie ma kolumny 'Close' - sprawdzamy to
+    # zwykłym testem przynależności zamiast obsługi wyjątku
+    if dane.empty:
+        return pd.DataFrame()
+    if not isinstance(dane.columns, pd.MultiIndex):
+        # yfinance < 0.2.48 zwraca płaskie kolumny dla paczki z jednym tickerem
+        if len(paczka) != 1 or 'Close' not in dane.columns:
+            return pd.DataFrame()
+        return dane[['Close']].rename(columns={'Close': paczka[0]})
+    if 'Close' not in dane.columns.get_level_values(1):
+        return pd.DataFrame()
+    # Skaner korzysta tylko z cen zamknięcia - od razu odrzucamy pozostałe kolumny,
+    # żeby w pamięci nie trzymać pełnego panelu Open/High/Low/Volume dla wszystkich paczek
+    return dane.xs('Close', axis=1, level=1).copy()
+
+def pobierz_dane_historyczne(tickers: list) -> pd.DataFrame:
+    """
+    Pobiera ceny zamknięcia z ostatnich 7 miesięcy w paczkach po ROZMIAR_PACZKI tickerów.
+    Przy DOWNLOAD_WIELOWATKOWY paczki są pobierane równolegle, w przeciwnym razie po kolei.
+
+    Args:
+        tickers (list): Lista tickerów do pobrania.
+
+    Returns:
+        pd.DataFrame: Macierz cen zamknięcia (dni × tickery) ze wszystkich paczek,
+                      lub pusta ramka, jeśli nic nie udało się pobrać.
+    """
+    paczki = [tickers[i:i + ROZMIAR_PACZKI] for i in range(0, len(tickers), ROZMIAR_PACZKI)]
+
+    if DOWNLOAD_WIELOWATKOWY:
+        with ThreadPoolExecutor(max_workers=MAX_WATKOW_DOWNLOAD) as executor:
+            wyniki = list(executor.map(pobierz_paczke, paczki))
+    else:
+        wyniki = [pobierz_paczke(paczka) for paczka in paczki]
+
+    czesci = [wynik for wynik in wyniki if not wynik.empty]
+    if not czesci:
+        return pd.DataFrame()
+    return pd.concat(czesci, axis=1)
+
+@njit(parallel=True, cache=True, error_model='numpy')
+def oblicz_wzrosty(ceny, dni_kwartal, dni_polrocze, dni_wzrost_krotki, dni_bez_spadku,
+                   out_wk, out_wp, out_w3, out_bez_spadku):
+    """
+    Jednym przebiegiem po macierzy cen (dni × tickery) liczy wszystkie wskaźniki dla każdej spółki.
+    Zakłada, że macierz nie zawiera brakujących cen w ostatnich dni_polrocze + 1 sesjach.
+
+    Args:
+        ceny (np.ndarray): Macierz cen zamknięcia, najlepiej w układzie kolumnowym (Fortran).
+        dni_kwartal (int): Liczba sesji w kwartale.
+        dni_polrocze (int): Liczba sesji w półroczu.
+        dni_wzrost_krotki (int): Liczba sesji, dla której liczony jest krótkoterminowy wzrost.
+        dni_bez_spadku (int): Liczba sesji, w których kurs nie może spaść.
+        out_wk, out_wp, out_w3 (np.ndarray): Wyjście - wzrost kwartalny, półroczny i krótkoterminowy w %.
+        out_bez_spadku (np.ndarray): Wyjście - True, jeśli cena nie spadła w ciągu dni_bez_spadku sesji.
+    """
+    n_dni, n_tickerow = ceny.shape
+    for t in prange(n_tickerow):
+        # Dzielenie przez zerową cenę daje inf (error_model='numpy'), które odpada na filtrach
+        cena_teraz = ceny[n_dni - 1, t]
+        out_wk[t] = (cena_teraz / ceny[n_dni - dni_kwartal, t] - 1) * 100
+        out_wp[t] = (cena_teraz / ceny[n_dni - dni_polrocze, t] - 1) * 100
+        out_w3[t] = (cena_teraz / ceny[n_dni - 1 - dni_wzrost_krotki, t] - 1) * 100
+        out_bez_spadku[t] = cena_teraz >= ceny[n_dni - 1 - dni_bez_spadku, t]
+
+@njit(cache=True)
+def policz_dni_wzrostu_i_spadku(ceny):
+    """
+    Liczy sesje wzrostowe i spadkowe w szeregu cen (odpowiednik diff() z porównaniem do zera).
+
+    Args:
+        ceny (np.ndarray): Jednowymiarowy szereg cen zamknięcia.
+
+    Returns:
+        tuple: (dni wzrostu, dni spadku, liczba zmian dziennych) - zmiany z brakującą ceną są pomijane.
+    """
+    dni_wzrostu = 0
+    dni_spadku = 0
+    liczba_zmian = 0
+    for i in range(1, ceny.shape[0]):
+        zmiana = ceny[i] - ceny[i - 1]
+        if np.isnan(zmiana):
+            continue
+        liczba_zmian += 1
+        if zmiana > 0:
+            dni_wzrostu += 1
+        elif zmiana < 0:
+            dni_spadku += 1
+    return dni_wzrostu, dni_spadku, liczba_zmian
+
+def skanuj_wzrosty(closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Oblicza wskaźniki wzrostu dla wszystkich spółek naraz za pomocą jądra oblicz_wzrosty.
+
+    Args:
+        closes (pd.DataFrame): Ceny zamknięcia (dni × tickery).
+
+    Returns:
+        pd.DataFrame: Ramka indeksowana tickerem ('Ticker') z kolumnami 'wzrost_kwartalny', 'wzrost_polroczny',
+                      'wzrost_3d' i 'bez_spadku_6d'.
+    """
+    # Układ kolumnowy sprawia, że historia jednej spółki leży w pamięci w jednym ciągłym bloku.
+    # Wyniki mają ten sam typ co ceny (znajdz_spolki_wzrostowe przekazuje float32).
+    ceny = np.asfortranarray(closes.to_numpy())
+    n_tickerow = ceny.shape[1]
+    out_wk = np.empty(n_tickerow, dtype=ceny.dtype)
+    out_wp = np.empty(n_tickerow, dtype=ceny.dtype)
+    out_w3 = np.empty(n_tickerow, dtype=ceny.dtype)
+    out_bez_spadku = np.empty(n_tickerow, dtype=np.bool_)
+
+    oblicz_wzrosty(ceny, DNI_KWARTAL, DNI_POLROCZE, DNI_WZROST_KROTKI, DNI_BEZ_SPADKU,
+                   out_wk, out_wp, out_w3, out_bez_spadku)
+
+    return pd.DataFrame({
+        'wzrost_kwartalny': out_wk,
+        'wzrost_polroczny': out_wp,
+        'wzrost_3d': out_w3,
+        'bez_spadku_6d': out_bez_spadku
+    }, index=closes.columns.rename('Ticker'))
+
+def formatuj_wyniki(spolki: pd.DataFrame, z_wzrostem_3d: bool = True) -> pd.DataFrame:
+    """
+    Przygotowuje tabelę wyników do wyświetlenia, formatując całe kolumny naraz (bez pętli po wierszach).
+
+    Args:
+        spolki (pd.DataFrame): Ramka spółek indeksowana tickerem, z kolumnami wzrostu i 'marketCap'.
+        z_wzrostem_3d (bool): Czy dołączyć kolumnę z 3-dniowym wzrostem.
+
+    Returns:
+        pd.DataFrame: Tabela z kolumną 'Ticker' i sformatowanymi wartościami tekstowymi.
+    """
+    # Obliczenia odbywają się we float32, do wyświetlenia wracamy do float64
+    market_cap = spolki['marketCap'].to_numpy(dtype=np.float64)
+    kolumny = {}
+    if z_wzrostem_3d:
+        kolumny['Wzrost (3D)'] = np.char.mod('%.2f%%', spolki['wzrost_3d'].to_numpy(dtype=np.float64))
+    kolumny['Wzrost (kwartał)'] = np.char.mod('%.2f%%', spolki['wzrost_kwartalny'].to_numpy(dtype=np.float64))
+    kolumny['Wzrost (pół roku)'] = np.char.mod('%.2f%%', spolki['wzrost_polroczny'].to_numpy(dtype=np.float64))
+    kolumny['Kapitalizacja'] = np.where(market_cap >= 1_000_000_000,
+                                        np.char.mod('%.2fB', market_cap / 1_000_000_000),
+                                        np.char.mod('%.2fM', market_cap / 1_000_000))
+    return pd.DataFrame(kolumny, index=spolki.index).reset_index()
+
+def znajdz_spolki_wzrostowe(tickers: list, limit_spolek: int = 4000, kroki: int = 4):
     """
     Analizuje spółki i znajduje te, które spełniają kryteria wzrostu:
     - Wzrost 15-80% w ostatnim kwartale.
     - Wzrost 25-100% w ostatnim półroczu.
     - Kapitalizacja rynkowa > 100 mln USD.
     - Wzrost w ciągu ostatnich 3 dni mniejszy niż wzrost S&P 500.
-    - Brak spadku kursu w ciągu ostatnich 6 dni roboczych.
+    - Brak spadku kursu w ciągu ostatnich 6 dni roboczych (tylko przy kroki=4).
     
     Args:
         tickers (list): Lista tickerów do analizy.
         limit_spolek (int): Maksymalna liczba spółek do przeanalizowania.
+        kroki (int): Liczba stosowanych kroków filtrowania (3 lub 4).
     """
     if not tickers:
         print("Lista tickerów jest pusta.")
@@ -51,19 +362,27 @@ def znajdz_spolki_wzrostowe(tickers: list, limit_spolek: int = 4000):
     tickers_do_analizy = tickers[:limit_spolek]
     print(f"Rozpoczynam analizę {len(tickers_do_analizy)} spółek...")
 
-    # Krok 0: Pobierz dane dla S&P 500 PRZED głównym zapytaniem, aby uniknąć błędów w yfinance
-    print("\nPobieranie danych dla S&P 500 (^GSPC)...")
-    sp500_data = yf.download('^GSPC', period='5d', auto_adjust=True, progress=False)
-    sp500_wzrost_3d = None
-    if len(sp500_data) >= 4:
-        # Odporne na błędy pobieranie kolumny 'Close', niezależnie od formatu zwracanego przez yfinance
-        if isinstance(sp500_data.columns, pd.MultiIndex):
-            # Jeśli kolumny są wielopoziomowe, 'Close' może być na górnym poziomie.
-            # Wybieramy go, a następnie bierzemy pierwszą kolumnę danych.
-            close_prices = sp500_data['Close'].iloc[:, 0]
-        else:
-            close_prices = sp500_data['Close']
+    # Krok 0: Dane dla S&P 500 i dla spółek to dwa niezależne zapytania sieciowe. Gdy yfinance trzyma wyniki
+    # we współdzielonym stanie (patrz DOWNLOAD_WIELOWATKOWY), Ticker.history przy błędzie też zapisuje do
+    # shared._DFS, więc wtedy pobieramy je po kolei - indeks PRZED głównym zapytaniem.
+    print("\nPobieranie danych dla S&P 500 (^GSPC) i danych historycznych dla spółek...")
+    sp500_ticker = yf.Ticker('^GSPC', session=SESJA_HTTP)
+    if DOWNLOAD_WIELOWATKOWY:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sp500_future = executor.submit(sp500_ticker.history, period='5d', auto_adjust=True, actions=False)
+            closes_future = executor.submit(pobierz_dane_historyczne, tickers_do_analizy)
+            sp500_data = sp500_future.result()
+            closes = closes_future.result()
+    else:
+        sp500_data = sp500_ticker.history(period='5d', auto_adjust=True, actions=False)
+        closes = pobierz_dane_historyczne(tickers_do_analizy)
+
+    # Z danych indeksu potrzebujemy tylko cen zamknięcia (Ticker.history zwraca zwykłe, jednopoziomowe kolumny)
+    close_prices = sp500_data['Close'] if 'Close' in sp500_data.columns else pd.Series(dtype=float)
+    del sp500_data
 
+    sp500_wzrost_3d = None
+    if len(close_prices) >= 4:
         sp500_cena_teraz = close_prices.iloc[-1]
         sp500_cena_3d_temu = close_prices.iloc[-4]
         
@@ -73,187 +392,115 @@ def znajdz_spolki_wzrostowe(tickers: list, limit_spolek: int = 4000):
     else:
         print("Ostrzeżenie: Nie udało się pobrać wystarczających danych dla S&P 500, aby obliczyć 3-dniowy wzrost. Ten krok zostanie pominięty.")
 
-    # Pobieramy dane z ostatnich 7 miesięcy, aby mieć pewność, że pokryjemy 6 miesięcy handlowych.
-    # auto_adjust=True automatycznie dostosowuje ceny o dywidendy i splity, co jest lepsze do analizy zwrotów.
-    print("Pobieranie danych historycznych dla spółek...")
-    data = yf.download(tickers_do_analizy, period="7mo", auto_adjust=True, progress=True, group_by='ticker')
-
-    if data.empty:
+    if closes.empty:
         print("Nie udało się pobrać danych dla analizy wzrostu.")
         return
 
-    # Definicja okresów w dniach handlowych (przybliżenie)
-    dni_kwartal = 63
-    dni_polrocze = 126
+    if len(closes) < DNI_POLROCZE + 1:
+        print("Pobrana historia jest za krótka, aby obliczyć wzrost półroczny.")
+        return
+
+    # Jednorazowo odrzucamy spółki z brakami w analizowanym oknie - dalsze kroki nie muszą już sprawdzać NaN
+    okno = max(DNI_POLROCZE, DNI_BEZ_SPADKU) + 1
+    closes = closes.loc[:, closes.iloc[-okno:].notna().all(axis=0)]
 
-    kandydaci = []
+    # Do procentowych zmian w zupełności wystarcza float32 - połowa pamięci i przepustowości względem float64
+    closes = closes.astype(np.float32)
+
+    # Wszystkie wskaźniki (kroki 1, 3 i 4) liczymy w jednym przebiegu po macierzy cen.
+    # Dalej pracujemy na jednej ramce indeksowanej tickerem, zawężanej maską po każdym kroku.
+    spolki = skanuj_wzrosty(closes)
 
     print("\nKrok 1: Filtrowanie spółek według kryteriów wzrostu (kwartał/półrocze)...")
-    for ticker in tickers_do_analizy:
-        try:
-            historia_spolki = data[ticker]['Close'].dropna()
-
-            # Sprawdzamy, czy mamy wystarczająco dużo danych historycznych
-            if len(historia_spolki) < dni_polrocze + 1:
-                continue  # Pomijamy spółkę, jeśli nie ma historii na 6 miesięcy
-
-            # Pobieramy ceny: aktualną, sprzed kwartału i sprzed półrocza
-            cena_aktualna = historia_spolki.iloc[-1]
-            cena_kwartal_temu = historia_spolki.iloc[-dni_kwartal]
-            cena_pol_roku_temu = historia_spolki.iloc[-dni_polrocze]
-
-            # Obliczamy procentowe zmiany
-            wzrost_kwartalny = (cena_aktualna / cena_kwartal_temu - 1) * 100
-            wzrost_polroczny = (cena_aktualna / cena_pol_roku_temu - 1) * 100
-
-            # Sprawdzamy, czy oba warunki są spełnione
-            if (15 <= wzrost_kwartalny <= 80) and (25 <= wzrost_polroczny <= 100):
-                kandydaci.append({
-                    'Ticker': ticker,
-                    'wzrost_kwartalny': wzrost_kwartalny,
-                    'wzrost_polroczny': wzrost_polroczny
-                })
-        except (KeyError, IndexError, ZeroDivisionError):
-            # Ignorujemy błędy dla pojedynczych spółek (brak danych, za krótka historia, cena=0)
-            continue
+    spolki = spolki[spolki['wzrost_kwartalny'].between(15, 80) & spolki['wzrost_polroczny'].between(25, 100)]
 
-    if not kandydaci:
+    if spolki.empty:
         print("\nNie znaleziono żadnych spółek spełniających kryteria wzrostu kwartalnego/półrocznego.")
         return
 
-    print(f"\nZnaleziono {len(kandydaci)} kandydatów. Krok 2: Sprawdzanie kapitalizacji rynkowej (> 100M USD)...")
-    
-    kandydaci_po_kapitalizacji = []
-    for kandydat in kandydaci:
-        try:
-            ticker_obj = yf.Ticker(kandydat['Ticker'])
-            market_cap = ticker_obj.info.get('marketCap')
-
-            # Sprawdzamy warunek kapitalizacji
-            if market_cap and market_cap > 100_000_000:
-                kandydat['marketCap'] = market_cap # Dodajemy do słownika do późniejszego formatowania
-                kandydaci_po_kapitalizacji.append(kandydat)
-        except Exception:
-            # Ignorujemy błędy przy pobieraniu info dla pojedynczego tickera
-            continue
+    print(f"\nZnaleziono {len(spolki)} kandydatów. Krok 2: Sprawdzanie kapitalizacji rynkowej (> 100M USD)...")
     
-    if not kandydaci_po_kapitalizacji:
+    # Najpierw sprawdzamy lokalny cache - do Yahoo pytamy tylko o brakujące spółki
+    kapitalizacje = wczytaj_kapitalizacje_z_cache(spolki.index.tolist())
+    brakujace = [ticker for ticker in spolki.index if ticker not in kapitalizacje]
+    print(f"Kapitalizacja z cache: {len(kapitalizacje)}, do pobrania: {len(brakujace)}.")
+
+    if brakujace:
+        # Każde zapytanie to osobny round-trip HTTPS do Yahoo, więc wykonujemy je równolegle
+        with ThreadPoolExecutor(max_workers=MAX_WATKOW_INFO) as executor:
+            pobrane = {ticker: market_cap
+                       for ticker, market_cap in executor.map(pobierz_kapitalizacje, brakujace)
+                       if market_cap}
+        zapisz_kapitalizacje_do_cache(pobrane)
+        kapitalizacje.update(pobrane)
+
+    # Sprawdzamy warunek kapitalizacji (spółki bez danych dostają NaN i odpadają)
+    spolki = spolki.assign(marketCap=spolki.index.map(kapitalizacje))
+    spolki = spolki[spolki['marketCap'] > 100_000_000]
+
+    if spolki.empty:
         print("\nŻaden z kandydatów nie spełnił kryterium kapitalizacji rynkowej.")
         return
 
     if sp500_wzrost_3d is None:
         print("\nPominięto Krok 3 (porównanie z S&P 500) z powodu braku danych.")
         # W tym przypadku po prostu wyświetlamy wyniki z kroku 2
-        finalne_spolki_dane = []
-        for kandydat in kandydaci_po_kapitalizacji:
-            market_cap = kandydat['marketCap']
-            if market_cap >= 1_000_000_000:
-                kapitalizacja_str = f"{market_cap / 1_000_000_000:.2f}B"
-            else:
-                kapitalizacja_str = f"{market_cap / 1_000_000:.2f}M"
-            finalne_spolki_dane.append({
-                'Ticker': kandydat['Ticker'],
-                'Wzrost (kwartał)': f"{kandydat['wzrost_kwartalny']:.2f}%",
-                'Wzrost (pół roku)': f"{kandydat['wzrost_polroczny']:.2f}%",
-                'Kapitalizacja': kapitalizacja_str
-            })
-        wyniki_df = pd.DataFrame(finalne_spolki_dane)
+        wyniki_df = formatuj_wyniki(spolki, z_wzrostem_3d=False)
         print("\n--- Spółki spełniające kryteria wzrostu i kapitalizacji ---")
         print(wyniki_df.to_string(index=False))
         return
 
-    print(f"\nKrok 3: Filtrowanie {len(kandydaci_po_kapitalizacji)} spółek na podstawie 3-dniowego wzrostu (wolniej niż S&P 500)...")
-    finalne_spolki = []
-    for kandydat in kandydaci_po_kapitalizacji:
-        try:
-            # Używamy już pobranych danych
-            historia_spolki = data[kandydat['Ticker']]['Close'].dropna()
-
-            # Sprawdzamy, czy mamy wystarczająco danych do obliczenia 3-dniowego wzrostu
-            if len(historia_spolki) >= 4:
-                cena_teraz = historia_spolki.iloc[-1]
-                cena_3d_temu = historia_spolki.iloc[-4]
-
-                # Unikamy dzielenia przez zero
-                if cena_3d_temu > 0:
-                    wzrost_3d_spolki = (cena_teraz / cena_3d_temu - 1) * 100
-
-                    # Porównujemy wzrost spółki ze wzrostem S&P 500
-                    if wzrost_3d_spolki < sp500_wzrost_3d:
-                        kandydat['wzrost_3d'] = wzrost_3d_spolki
-                        finalne_spolki.append(kandydat)
-        except (KeyError, IndexError, ZeroDivisionError):
-            continue
+    print(f"\nKrok 3: Filtrowanie {len(spolki)} spółek na podstawie 3-dniowego wzrostu (wolniej niż S&P 500)...")
+    # Porównujemy wzrost spółki ze wzrostem S&P 500 (wskaźniki policzone już w kroku 1)
+    spolki = spolki[spolki['wzrost_3d'] < sp500_wzrost_3d]
 
-    if not finalne_spolki:
+    if spolki.empty:
         print("\nNie znaleziono żadnych spółek spełniających pierwsze trzy kryteria (wzrost, kap., porównanie z S&P500).")
         return
 
     # Krok 4: Eliminacja spółek, które spadły w ciągu ostatnich 6 dni.
-    print(f"\nKrok 4: Filtrowanie {len(finalne_spolki)} spółek pod kątem braku spadku w ostatnich 6 dniach roboczych...")
-    ostateczne_spolki = []
-    for kandydat in finalne_spolki:
-        try:
-            historia_spolki = data[kandydat['Ticker']]['Close'].dropna()
-
-            # Potrzebujemy co najmniej 7 dni danych (dzisiaj + 6 dni wstecz)
-            if len(historia_spolki) >= 7:
-                cena_teraz = historia_spolki.iloc[-1]
-                cena_6d_temu = historia_spolki.iloc[-7]
+    if kroki >= 4:
+        print(f"\nKrok 4: Filtrowanie {len(spolki)} spółek pod kątem braku spadku w ostatnich 6 dniach roboczych...")
+        # Sprawdzamy, czy cena nie spadła (dzisiaj + 6 dni wstecz)
+        spolki = spolki[spolki['bez_spadku_6d']]
 
-                # Sprawdzamy, czy cena nie spadła
-                if cena_teraz >= cena_6d_temu:
-                    ostateczne_spolki.append(kandydat)
-        except (KeyError, IndexError):
-            continue
-
-    if not ostateczne_spolki:
+    if spolki.empty:
         print("\nNie znaleziono żadnych spółek spełniających wszystkie cztery kryteria.")
     else:
         # Przygotowanie danych do wyświetlenia
-        finalne_spolki_dane = []
-        for spolka in ostateczne_spolki:
-            market_cap = spolka['marketCap']
-            kapitalizacja_str = f"{market_cap / 1_000_000_000:.2f}B" if market_cap >= 1_000_000_000 else f"{market_cap / 1_000_000:.2f}M"
-            finalne_spolki_dane.append({
-                'Ticker': spolka['Ticker'], 'Wzrost (3D)': f"{spolka['wzrost_3d']:.2f}%",
-                'Wzrost (kwartał)': f"{spolka['wzrost_kwartalny']:.2f}%", 'Wzrost (pół roku)': f"{spolka['wzrost_polroczny']:.2f}%",
-                'Kapitalizacja': kapitalizacja_str
-            })
+        wyniki_df = formatuj_wyniki(spolki)
         print("\n--- Spółki spełniające wszystkie kryteria ---")
-        wyniki_df = pd.DataFrame(finalne_spolki_dane)
-        wyniki_df = wyniki_df[['Ticker', 'Wzrost (3D)', 'Wzrost (kwartał)', 'Wzrost (pół roku)', 'Kapitalizacja']]
         print(wyniki_df.to_string(index=False))
 
         # Zapisywanie kluczowych wyników do pliku tekstowego
         nazwa_pliku = 'wynik.txt'
+        # Format: Ticker, wzrost 3 mies., wzrost 6 mies., wzrost 3 dni
+        linie = [
+            f"{spolka.Index}, {spolka.wzrost_kwartalny:.2f}, {spolka.wzrost_polroczny:.2f}, {spolka.wzrost_3d:.2f}"
+            for spolka in spolki.itertuples()
+        ]
+        # Ostatnia linia z wynikiem S&P 500 dla spójności
+        if sp500_wzrost_3d is not None:
+            linie.append(f"SP500, {sp500_wzrost_3d:.2f}")
         try:
-            with open(nazwa_pliku, 'w') as f:
-                for spolka in ostateczne_spolki:
-                    # Format: Ticker, wzrost 3 mies., wzrost 6 mies., wzrost 3 dni
-                    linia = (
-                        f"{spolka['Ticker']}, "
-                        f"{spolka['wzrost_kwartalny']:.2f}, "
-                        f"{spolka['wzrost_polroczny']:.2f}, "
-                        f"{spolka['wzrost_3d']:.2f}\n"
-                    )
-                    f.write(linia)
-                
-                # Ostatnia linia z wynikiem S&P 500 dla spójności
-                if sp500_wzrost_3d is not None:
-                    f.write(f"SP500, {sp500_wzrost_3d:.2f}\n")
+            # Cały plik zapisujemy jednym wywołaniem zamiast linia po linii
+            Path(nazwa_pliku).write_text('\n'.join(linie) + '\n')
             print(f"\nKluczowe dane zostały zapisane do pliku: {nazwa_pliku}")
         except IOError as e:
             print(f"\nNie udało się zapisać wyników do pliku. Błąd: {e}")
 
     # Podsumowanie S&P 500 na koniec
-    if not sp500_data.empty and len(sp500_data) > 1:
-        zmiany_dzienne = sp500_data['Close'].diff().dropna()
-        dni_wzrostu = (zmiany_dzienne > 0).sum()
-        dni_spadku = (zmiany_dzienne < 0).sum()
-        print(f"\nPodsumowanie S&P 500 z ostatnich {len(zmiany_dzienne)} dni handlowych: Dni wzrostu: {dni_wzrostu}, Dni spadku: {dni_spadku}.")
+    if len(close_prices) > 1:
+        dni_wzrostu, dni_spadku, liczba_zmian = policz_dni_wzrostu_i_spadku(
+            np.ascontiguousarray(close_prices.to_numpy(dtype=np.float64)))
+        print(f"\nPodsumowanie S&P 500 z ostatnich {liczba_zmian} dni handlowych: Dni wzrostu: {dni_wzrostu}, Dni spadku: {dni_spadku}.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Skaner spółek wzrostowych z NASDAQ.")
+    parser.add_argument('--kroki', type=int, choices=[3, 4], default=4,
+                        help="Liczba kroków filtrowania: 3 pomija warunek braku spadku w ostatnich 6 dniach.")
+    args = parser.parse_args()
+
     lista_spolek = pobierz_liste_spolek_nasdaq()
     if lista_spolek:
-        znajdz_spolki_wzrostowe(lista_spolek, limit_spolek=300)
\ No newline at end of file
+        znajdz_spolki_wzrostowe(lista_spolek, limit_spolek=300, kroki=args.kroki)
\ No newline at end of file